@@ -0,0 +1,217 @@
+# agents/a2a_bus.py
+
+import json
+import time
+from collections import deque
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from agents.a2a_protocol import A2AMessage
+
+# Use the same global logger instance configured in main.py
+logger = logging.getLogger('APW-STRATEGIST')
+
+
+# --- 1. Typed Topics ---
+
+class Topic(str, Enum):
+    """Defines the restricted topic choices on the in-process A2A bus."""
+    NEW_STRATEGY_SAVE = "NEW_STRATEGY_SAVE"
+    OPTIMIZATION_SAVE = "OPTIMIZATION_SAVE"
+    DELETE_ENTRY = "DELETE_ENTRY"
+    SIMULATION_RESULT = "SIMULATION_RESULT"  # High-rate: one per optimizer candidate
+    TELEMETRY_SAMPLE = "TELEMETRY_SAMPLE"    # High-rate: telemetry replay
+
+
+# --- 2. Internal (Trusted) Message ---
+
+class BusMessage:
+    """
+    Lightweight message used between trusted agents inside the process.
+    It carries the same fields as A2AMessage but skips Pydantic validation and
+    stores the timestamp as a float (epoch seconds) so no string formatting
+    happens on the hot path. Convert with to_a2a() when leaving the process.
+    """
+    __slots__ = ("sender_agent", "timestamp", "target_intent", "user_input", "payload", "status")
+
+    def __init__(self, sender_agent: str, target_intent: str, user_input: str = "",
+                 payload: Any = None, status: str = "SUCCESS", timestamp: Optional[float] = None):
+        self.sender_agent = sender_agent
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.target_intent = target_intent
+        self.user_input = user_input
+        self.payload = payload
+        self.status = status
+
+    def to_a2a(self) -> A2AMessage:
+        """Builds the validated A2AMessage used at process or network boundaries."""
+        return A2AMessage(
+            sender_agent=self.sender_agent,
+            timestamp=datetime.fromtimestamp(self.timestamp, timezone.utc).isoformat(),
+            target_intent=self.target_intent,
+            user_input=self.user_input,
+            payload=self.payload,
+            status=self.status
+        )
+
+    @classmethod
+    def from_a2a(cls, message: A2AMessage) -> "BusMessage":
+        """
+        Converts an already-validated A2AMessage into an internal message.
+        Offset timestamps keep their instant; naive ones are read as local time.
+        """
+        return cls(
+            sender_agent=message.sender_agent,
+            target_intent=message.target_intent,
+            user_input=message.user_input,
+            payload=message.payload,
+            status=message.status,
+            timestamp=datetime.fromisoformat(message.timestamp).timestamp()
+        )
+
+
+# --- 3. Boundary Serialization (Compact Format) ---
+
+def encode_message(message: A2AMessage) -> bytes:
+    """
+    Serializes an A2AMessage into a compact positional JSON array:
+    [sender_agent, timestamp, target_intent, user_input, payload, status]
+    Raises ValueError for payloads that are not strict JSON (e.g. NaN or -inf).
+    """
+    try:
+        encoded = json.dumps(
+            [message.sender_agent, message.timestamp, message.target_intent,
+             message.user_input, message.payload, message.status],
+            separators=(',', ':'),
+            allow_nan=False
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"A2A message payload is not valid JSON: {e}") from e
+    return encoded.encode("utf-8")
+
+
+def decode_message(data: bytes) -> A2AMessage:
+    """
+    Parses the compact format and validates it with Pydantic (untrusted input).
+    Every malformed input raises ValueError (pydantic's ValidationError is a subclass).
+    """
+    try:
+        fields = json.loads(data)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"A2A message is not valid JSON: {e}") from e
+    if not isinstance(fields, list) or len(fields) != 6:
+        raise ValueError("A2A message must be a JSON array of 6 fields.")
+    sender_agent, timestamp, target_intent, user_input, payload, status = fields
+    return A2AMessage(
+        sender_agent=sender_agent,
+        timestamp=timestamp,
+        target_intent=target_intent,
+        user_input=user_input,
+        payload=payload,
+        status=status
+    )
+
+
+# --- 4. The Message Bus ---
+
+Handler = Callable[[List[BusMessage]], None]
+
+
+class A2ABus:
+    """
+    In-process message bus for Agent-to-Agent communication.
+    Each topic has a bounded queue; subscribers receive messages in batches
+    when the bus is flushed. A full queue is flushed before accepting more
+    messages, which applies back-pressure to high-rate producers instead of
+    growing memory without limit. Handler failures are logged and never reach
+    producers; callers that must report them use flush(raise_errors=True).
+    Not thread-safe: use one bus per thread.
+    """
+
+    def __init__(self, max_queue_size: int = 1024, batch_size: int = 256):
+        if max_queue_size < 1 or batch_size < 1:
+            raise ValueError("max_queue_size and batch_size must be at least 1.")
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self._queues: Dict[Topic, deque] = {}
+        self._subscribers: Dict[Topic, List[Handler]] = {}
+
+    def subscribe(self, topic: Topic, handler: Handler):
+        """Registers a handler that receives lists of BusMessage for a topic."""
+        topic = Topic(topic)
+        self._subscribers.setdefault(topic, []).append(handler)
+        self._queues.setdefault(topic, deque())
+
+    def publish(self, topic: Topic, sender_agent: str, payload: Any = None,
+                user_input: str = "", status: str = "SUCCESS") -> bool:
+        """
+        Queues a trusted internal message without validation.
+        Returns False (and drops the message) when nobody subscribes to the topic.
+        """
+        if not isinstance(topic, Topic):
+            topic = Topic(topic)
+        return self._enqueue(topic, BusMessage(sender_agent, topic.value, user_input, payload, status))
+
+    def publish_external(self, data: bytes) -> bool:
+        """
+        Boundary entry point: decodes, validates and queues an external message.
+        Malformed messages and unknown topics are logged and dropped (returns False).
+        """
+        try:
+            message = decode_message(data)
+        except ValueError as e:
+            logger.warning(f"A2A BUS: Dropping malformed external message: {e}")
+            return False
+        try:
+            topic = Topic(message.target_intent)
+        except ValueError:
+            logger.warning(f"A2A BUS: Dropping external message with unknown topic '{message.target_intent}'.")
+            return False
+        return self._enqueue(topic, BusMessage.from_a2a(message))
+
+    def pending(self, topic: Optional[Topic] = None) -> int:
+        """Returns the number of undelivered messages for one topic or all topics."""
+        if topic is not None:
+            return len(self._queues.get(Topic(topic), ()))
+        return sum(len(q) for q in self._queues.values())
+
+    def flush(self, topic: Optional[Topic] = None, raise_errors: bool = False):
+        """
+        Delivers all queued messages (for one topic or every topic) in batches.
+        With raise_errors=True, the first handler error is re-raised after
+        every queued message has been delivered.
+        """
+        topics = [Topic(topic)] if topic is not None else list(self._queues)
+        error = None
+        for t in topics:
+            queue = self._queues.get(t)
+            if queue:
+                error = error or self._drain(t, queue)
+        if raise_errors and error is not None:
+            raise error
+
+    def _enqueue(self, topic: Topic, message: BusMessage) -> bool:
+        queue = self._queues.get(topic)
+        if queue is None:
+            return False
+        if len(queue) >= self.max_queue_size:
+            self._drain(topic, queue)  # Back-pressure; handler errors are only logged
+        queue.append(message)
+        return True
+
+    def _drain(self, topic: Topic, queue: deque) -> Optional[Exception]:
+        """Delivers the whole queue, logging handler errors and returning the first one."""
+        handlers = self._subscribers.get(topic, [])
+        error = None
+        while queue:
+            count = min(self.batch_size, len(queue))
+            batch = [queue.popleft() for _ in range(count)]
+            for handler in handlers:
+                try:
+                    handler(batch)
+                except Exception as e:
+                    logger.error(f"A2A BUS: Handler failed on topic {topic.value}: {e}")
+                    error = error or e
+        return error
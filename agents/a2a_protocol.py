@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from typing import Any, Optional
 
@@ -16,4 +16,11 @@ class A2AMessage(BaseModel):
     # --- Payload ---
     user_input: str = Field(description="The raw user input associated with this action.")
     payload: Optional[Any] = Field(default=None, description="The core data payload (e.g., Strategy details, optimization result).")
-    status: str = Field(default="SUCCESS", description="The status of the originating agent's operation (e.g., SUCCESS, FAILURE).")
\ No newline at end of file
+    status: str = Field(default="SUCCESS", description="The status of the originating agent's operation (e.g., SUCCESS, FAILURE).")
+
+    @field_validator("timestamp")
+    @classmethod
+    def timestamp_must_be_iso(cls, value: str) -> str:
+        """Rejects timestamps that are not ISO 8601 datetimes."""
+        datetime.fromisoformat(value)  # Raises ValueError, reported as a ValidationError
+        return value
@@ -1,13 +1,18 @@
 # agents/decision_loop_agent.py
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from google import genai
 from tools.simulation_tool import calculate_race_delta
+from tools.simulation_cache import SimulationCache
+from agents.a2a_bus import A2ABus, Topic
 
-def run_optimization_loop(client: genai.Client, topic: str) -> Dict[str, Any]:
+def run_optimization_loop(client: genai.Client, topic: str, bus: Optional[A2ABus] = None,
+                          cache: Optional[SimulationCache] = None) -> Dict[str, Any]:
     """
     Implements the Loop Agent logic: iterates through a range of pit laps, 
     calls the simulation tool, and identifies the best strategy.
+    If a bus is given, every candidate is published on Topic.SIMULATION_RESULT.
+    If a cache is given, candidates already simulated are looked up instead.
     """
     
     # 1. Configuration for the Loop (Hardcoded for Capstone Demo)
@@ -18,6 +23,7 @@ def run_optimization_loop(client: genai.Client, topic: str) -> Dict[str, Any]:
     
     best_lap = 0
     max_delta = -float('inf')
+    simulate = cache if cache is not None else calculate_race_delta
     
     print("\n Loop Agent: Starting Optimization...")
     print(f"   Searching for optimal pit lap between Lap {START_LAP} and Lap {END_LAP} using {TIRE_TYPE} tires.")
@@ -27,7 +33,7 @@ def run_optimization_loop(client: genai.Client, topic: str) -> Dict[str, Any]:
         
         # A. Call the Custom Tool
         try:
-            current_delta = calculate_race_delta(
+            current_delta = simulate(
                 strategy_name=STRATEGY_NAME,
                 pit_lap=lap,
                 tire_type=TIRE_TYPE
@@ -36,6 +42,12 @@ def run_optimization_loop(client: genai.Client, topic: str) -> Dict[str, Any]:
             print(f" Loop failed to execute simulation for Lap {lap}. Error: {e}")
             continue
 
+        if bus is not None:
+            bus.publish(
+                Topic.SIMULATION_RESULT, "LoopAgent",
+                payload={'strategy_name': STRATEGY_NAME, 'pit_lap': lap, 'tire_type': TIRE_TYPE, 'calculated_delta': current_delta}
+            )
+
         # B. Decision/Evaluation (Finding the Maximum Gain)
         if current_delta > max_delta:
             max_delta = current_delta
@@ -44,6 +56,11 @@ def run_optimization_loop(client: genai.Client, topic: str) -> Dict[str, Any]:
         else:
             print(f"   -> Lap {lap}: Delta = {current_delta:.2f}s.")
             
+    if cache is not None:
+        cache.flush()
+    if bus is not None:
+        bus.flush(Topic.SIMULATION_RESULT)
+
     print(f"\n Loop Agent Complete: Optimal Pit Lap Found: {best_lap} (Gain: {max_delta:.2f}s)")
 
     # 3. Final LLM Reasoning
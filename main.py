@@ -1,4 +1,5 @@
 import os
+import atexit
 import json
 from dotenv import load_dotenv
 from google import genai
@@ -8,10 +9,11 @@ from datetime import datetime
 
 # Custom Project Imports
 from tools.simulation_tool import calculate_race_delta 
+from tools.simulation_cache import SimulationCache
 from database import initialize_db, save_strategy_to_db, get_all_strategies_from_db, delete_strategy_by_id, get_all_strategies_from_db # Re-import get_all_strategies_from_db for context
 from agents.intent_agent import classify_intent 
 from agents.decision_loop_agent import run_optimization_loop
-from agents.a2a_protocol import A2AMessage 
+from agents.a2a_bus import A2ABus, Topic
 
 # Configure a robust logger that outputs to a file (for tracing) and the console
 logging.basicConfig(
@@ -79,9 +81,62 @@ def get_context_compaction_data(limit: int = 3) -> str:
     return context_str
 
 
+# --- 1b. Memory Agent Subscribers (A2A Bus) ---
+
+def on_strategy_save(messages):
+    """Memory Agent: persists every strategy/optimization message in the batch."""
+    for message in messages:
+        last_id = save_strategy_to_db(message.user_input, message.payload)
+        logger.info(f"A2A PROTOCOL: {message.sender_agent} sent message to Memory. ID: {last_id}")
+        label = "Optimization" if message.target_intent == Topic.OPTIMIZATION_SAVE.value else "Strategy"
+        print(f"\n Memory Agent: {label} saved to database with ID: {last_id}")
+
+
+def on_delete_entry(messages):
+    """Memory Agent: deletes the entries requested in the batch."""
+    for message in messages:
+        payload = message.payload if isinstance(message.payload, dict) else {}
+        strategy_id = payload.get('strategy_id')
+        if not isinstance(strategy_id, int):
+            raise ValueError(f"DELETE_ENTRY payload must contain an integer 'strategy_id', got: {message.payload}")
+        rows = delete_strategy_by_id(strategy_id)
+        if rows > 0:
+            logger.info(f"ACTION: Entry deleted from memory. ID: {strategy_id}")
+            print(f"Entry with ID {strategy_id} successfully deleted from memory.")
+        else:
+            logger.warning(f"DATABASE ERROR: Attempted to delete non-existent ID: {strategy_id}")
+            print(f"Strategy ID {strategy_id} not found.")
+
+
+def on_simulation_result(messages):
+    """Trace Logger: records each batch of optimizer candidates in the agent trace."""
+    results = ", ".join(
+        f"Lap {m.payload['pit_lap']}={m.payload['calculated_delta']:.2f}s" for m in messages
+    )
+    logger.info(f"TRACE: {messages[0].sender_agent} simulated {len(messages)} candidates: {results}")
+
+
+def create_bus() -> A2ABus:
+    """Builds the in-process A2A bus and registers the Memory Agent and trace logger on it."""
+    bus = A2ABus()
+    bus.subscribe(Topic.NEW_STRATEGY_SAVE, on_strategy_save)
+    bus.subscribe(Topic.OPTIMIZATION_SAVE, on_strategy_save)
+    bus.subscribe(Topic.DELETE_ENTRY, on_delete_entry)
+    bus.subscribe(Topic.SIMULATION_RESULT, on_simulation_result)
+    return bus
+
+
+def deliver(bus: A2ABus, topic: Topic):
+    """Delivers a topic synchronously and tells the user if a handler failed."""
+    try:
+        bus.flush(topic, raise_errors=True)
+    except Exception as e:
+        print(f"Memory Agent Error: Could not complete {topic.value}. Error: {e}")
+
+
 # --- 2. Simulation Agent Function (Core LLM Logic + Tool Use) ---
 
-def run_f1_strategist(client: genai.Client, prompt: str):
+def run_f1_strategist(client: genai.Client, prompt: str, bus: A2ABus, cache: SimulationCache):
     """
     Runs the F1 strategist agent, using the Custom Tool and saving the result.
     This acts as the 'Simulation Agent' in the sequential flow.
@@ -129,7 +184,7 @@ def run_f1_strategist(client: genai.Client, prompt: str):
         
         if function_name == "calculate_race_delta":
             try:
-                tool_output = calculate_race_delta(**tool_args)
+                tool_output = cache(**tool_args)
                 logger.info(f"TOOL CALL: Calling tool with arguments: {tool_args}")
                 print(f"   -> Calling tool with: {tool_args}")
                 print(f"   -> Simulation result: {tool_output:.2f} seconds gain/loss.")
@@ -154,6 +209,7 @@ def run_f1_strategist(client: genai.Client, prompt: str):
         else:
             raise NotImplementedError(f"Unknown tool requested: {function_name}")
             
+    cache.flush()
     print("\n--- Final Advice (LLM Response) ---")
     print(response.text)
     
@@ -166,16 +222,8 @@ def run_f1_strategist(client: genai.Client, prompt: str):
         }
         
         # --- A2A Protocol Implementation for Memory Save ---
-        message = A2AMessage(
-            sender_agent="SimulationAgent",
-            target_intent="NEW_STRATEGY_SAVE",
-            user_input=prompt,
-            payload=strategy_details,
-            status="SUCCESS"
-        )
-        last_id = save_strategy_to_db(message.user_input, message.payload)
-        logger.info(f"A2A PROTOCOL: SimulationAgent sent message to Memory. ID: {last_id}, Delta: {tool_output:.2f}")
-        print(f"\n Memory Agent: Strategy saved to database with ID: {last_id}")
+        bus.publish(Topic.NEW_STRATEGY_SAVE, "SimulationAgent", payload=strategy_details, user_input=prompt)
+        deliver(bus, Topic.NEW_STRATEGY_SAVE)
         # --- END A2A Protocol Implementation ---
 
 
@@ -191,6 +239,9 @@ if __name__ == "__main__":
 
     client = genai.Client(api_key=api_key)
     initialize_db() 
+    bus = create_bus()
+    simulation_cache = SimulationCache(calculate_race_delta)
+    atexit.register(simulation_cache.close)
     
     logger.info("SYSTEM STARTUP: F1 Strategist System Initialized.")
     print("F1 Strategist System Initialized! (Multi-Agent Running)")
@@ -249,22 +300,9 @@ if __name__ == "__main__":
                     strategy_id = int(parts[1]) # Extracts the number directly from the raw input
                     
                     # --- A2A Protocol Implementation for Delete ---
-                    message = A2AMessage(
-                        sender_agent="Dispatcher",
-                        target_intent="DELETE_ENTRY",
-                        user_input=user_input,
-                        payload={"strategy_id": strategy_id},
-                        status="SUCCESS" 
-                    )
-                    rows = delete_strategy_by_id(message.payload['strategy_id'])
+                    bus.publish(Topic.DELETE_ENTRY, "Dispatcher", payload={"strategy_id": strategy_id}, user_input=user_input)
+                    deliver(bus, Topic.DELETE_ENTRY)
                     # --- END A2A Protocol Implementation ---
-                    
-                    if rows > 0:
-                        logger.info(f"ACTION: Entry deleted from memory. ID: {strategy_id}")
-                        print(f"Entry with ID {strategy_id} successfully deleted from memory.")
-                    else:
-                        logger.warning(f"DATABASE ERROR: Attempted to delete non-existent ID: {strategy_id}")
-                        print(f"Strategy ID {strategy_id} not found.")
                 except ValueError:
                     logger.error("VALIDATION ERROR: Delete ID was not a number.")
                     print("Error: ID must be a number.")
@@ -275,29 +313,21 @@ if __name__ == "__main__":
             
             logger.info("DISPATCH: Calling Loop Agent (Optimization).")
             print("\n Calling Loop Agent for Optimization...")
-            optimization_result = run_optimization_loop(client, user_input)
+            optimization_result = run_optimization_loop(client, user_input, bus=bus, cache=simulation_cache)
             
             # Save optimization result and display LLM summary
             print("\n--- Final Advice (LLM Response) ---")
             print(optimization_result['llm_advice'])
             
             # --- A2A Protocol Implementation for Memory Save ---
-            message = A2AMessage(
-                sender_agent="LoopAgent",
-                target_intent="OPTIMIZATION_SAVE",
-                user_input=user_input,
-                payload=optimization_result,
-                status="SUCCESS"
-            )
-            last_id = save_strategy_to_db(message.user_input, message.payload)
-            logger.info(f"A2A PROTOCOL: LoopAgent sent message to Memory. ID: {last_id}")
-            print(f"\n Memory Agent: Optimization saved to database with ID: {last_id}")
+            bus.publish(Topic.OPTIMIZATION_SAVE, "LoopAgent", payload=optimization_result, user_input=user_input)
+            deliver(bus, Topic.OPTIMIZATION_SAVE)
             # --- END A2A Protocol Implementation ---
 
         # --- END ROBUST OPTIMIZE LOGIC ---
 
         elif intent == 'NEW_STRATEGY':
-            run_f1_strategist(client, user_input)
+            run_f1_strategist(client, user_input, bus, simulation_cache)
             
         else:
             logger.warning(f"DISPATCH ERROR: Input '{user_input}' classified as OTHER and not handled.")
@@ -0,0 +1,159 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+from pydantic import ValidationError
+from agents.decision_loop_agent import run_optimization_loop
+from agents.a2a_bus import A2ABus, Topic, BusMessage, encode_message, decode_message
+from agents.a2a_protocol import A2AMessage
+
+class TestA2ABus(unittest.TestCase):
+    """
+    Tests for the in-process A2A message bus and its boundary serialization.
+    """
+
+    # --- 1. Internal Delivery ---
+
+    def test_publish_and_flush_delivers_batches(self):
+        """Test: Queued messages are delivered in batches of batch_size on flush."""
+        bus = A2ABus(max_queue_size=100, batch_size=4)
+        batches = []
+        bus.subscribe(Topic.SIMULATION_RESULT, batches.append)
+
+        for lap in range(10):
+            bus.publish(Topic.SIMULATION_RESULT, "LoopAgent", payload={"pit_lap": lap})
+        self.assertEqual(bus.pending(Topic.SIMULATION_RESULT), 10)
+
+        bus.flush()
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+        self.assertEqual(batches[0][0].payload, {"pit_lap": 0})
+        self.assertEqual(bus.pending(), 0)
+
+    def test_full_queue_applies_back_pressure(self):
+        """Test: A full queue is drained before the next message is accepted."""
+        bus = A2ABus(max_queue_size=3, batch_size=10)
+        batches = []
+        bus.subscribe(Topic.TELEMETRY_SAMPLE, batches.append)
+
+        for i in range(4):
+            bus.publish(Topic.TELEMETRY_SAMPLE, "TelemetryReplay", payload=i)
+
+        self.assertEqual([[m.payload for m in b] for b in batches], [[0, 1, 2]])
+        self.assertEqual(bus.pending(Topic.TELEMETRY_SAMPLE), 1)
+
+    def test_publish_without_subscriber_is_dropped(self):
+        """Test: Messages for topics nobody listens to are not queued."""
+        bus = A2ABus()
+        self.assertFalse(bus.publish(Topic.DELETE_ENTRY, "Dispatcher", payload={"strategy_id": 1}))
+        self.assertEqual(bus.pending(), 0)
+
+    def test_publish_accepts_topic_strings(self):
+        """Test: publish() coerces plain strings to Topic, like subscribe()."""
+        bus = A2ABus()
+        batches = []
+        bus.subscribe("DELETE_ENTRY", batches.append)
+        self.assertTrue(bus.publish("DELETE_ENTRY", "Dispatcher", payload={"strategy_id": 1}))
+        bus.flush("DELETE_ENTRY")
+        self.assertEqual(batches[0][0].target_intent, "DELETE_ENTRY")
+
+    def test_handler_error_is_reraised_after_all_handlers_run(self):
+        """Test: flush(raise_errors=True) surfaces a handler error without starving other handlers."""
+        bus = A2ABus()
+        received = []
+        def failing(batch):
+            raise RuntimeError("database is locked")
+        bus.subscribe(Topic.OPTIMIZATION_SAVE, failing)
+        bus.subscribe(Topic.OPTIMIZATION_SAVE, received.append)
+        bus.publish(Topic.OPTIMIZATION_SAVE, "LoopAgent", payload={"pit_lap": 23})
+        with self.assertRaises(RuntimeError):
+            bus.flush(Topic.OPTIMIZATION_SAVE, raise_errors=True)
+        self.assertEqual(len(received), 1)
+
+    def test_handler_error_is_only_logged_by_default(self):
+        """Test: A plain flush() logs handler errors instead of raising into the producer."""
+        bus = A2ABus()
+        bus.subscribe(Topic.SIMULATION_RESULT, MagicMock(side_effect=KeyError("x")))
+        bus.publish(Topic.SIMULATION_RESULT, "LoopAgent", payload={"pit_lap": 23})
+        with self.assertLogs('APW-STRATEGIST', level='ERROR'):
+            bus.flush(Topic.SIMULATION_RESULT)
+        self.assertEqual(bus.pending(), 0)
+
+    def test_back_pressure_keeps_message_when_handler_fails(self):
+        """Test: A failing handler during a forced drain does not lose the new message."""
+        bus = A2ABus(max_queue_size=2)
+        bus.subscribe(Topic.TELEMETRY_SAMPLE, MagicMock(side_effect=RuntimeError("boom")))
+        with self.assertLogs('APW-STRATEGIST', level='ERROR'):
+            for i in range(3):
+                self.assertTrue(bus.publish(Topic.TELEMETRY_SAMPLE, "TelemetryReplay", payload=i))
+        self.assertEqual(bus.pending(Topic.TELEMETRY_SAMPLE), 1)
+
+    def test_failing_observer_does_not_break_optimization(self):
+        """Test: run_optimization_loop still returns its result if a SIMULATION_RESULT handler fails."""
+        bus = A2ABus()
+        bus.subscribe(Topic.SIMULATION_RESULT, MagicMock(side_effect=KeyError("x")))
+        client = MagicMock()
+        client.models.generate_content.return_value.text = "Pit on Lap 24."
+        with self.assertLogs('APW-STRATEGIST', level='ERROR'):
+            result = run_optimization_loop(client, "optimize", bus=bus)
+        self.assertEqual(result['pit_lap'], 24)
+        self.assertEqual(result['llm_advice'], "Pit on Lap 24.")
+
+    # --- 2. Boundary Serialization ---
+
+    def test_encode_decode_round_trip(self):
+        """Test: The compact format round-trips through a validated A2AMessage."""
+        original = BusMessage("LoopAgent", Topic.OPTIMIZATION_SAVE.value, "optimize", {"pit_lap": 23}).to_a2a()
+        decoded = decode_message(encode_message(original))
+        self.assertIsInstance(decoded, A2AMessage)
+        self.assertEqual(decoded, original)
+
+        # Offset timestamps keep their instant through the internal message and back
+        offset = decode_message(
+            b'["Dispatcher","2025-01-01T00:00:00+05:00","DELETE_ENTRY","delete 1",{"strategy_id":1},"SUCCESS"]'
+        )
+        restored = decode_message(encode_message(BusMessage.from_a2a(offset).to_a2a()))
+        self.assertEqual(datetime.fromisoformat(restored.timestamp), datetime.fromisoformat(offset.timestamp))
+        self.assertIsNotNone(datetime.fromisoformat(restored.timestamp).tzinfo)
+
+    def test_encode_rejects_non_finite_floats(self):
+        """Test: -inf (an optimization where every simulation failed) is not encoded as invalid JSON."""
+        message = BusMessage("LoopAgent", Topic.OPTIMIZATION_SAVE.value, "optimize",
+                             {"calculated_delta": -float('inf')}).to_a2a()
+        with self.assertRaises(ValueError):
+            encode_message(message)
+
+    def test_decode_rejects_invalid_fields(self):
+        """Test: Invalid field types raise a Pydantic ValidationError."""
+        with self.assertRaises(ValidationError):
+            decode_message(b'[null,"2025-01-01T00:00:00","DELETE_ENTRY","delete 1",{},"SUCCESS"]')
+        with self.assertRaises(ValidationError):
+            decode_message(b'["Dispatcher","not-a-time","DELETE_ENTRY","delete 1",{},"SUCCESS"]')
+
+    def test_decode_rejects_malformed_data_with_value_error(self):
+        """Test: Bad JSON and wrong array shapes raise ValueError, like validation errors."""
+        for data in (b'not json', b'{"sender_agent":"x"}', b'["Dispatcher","2025-01-01T00:00:00"]'):
+            with self.assertRaises(ValueError):
+                decode_message(data)
+
+    def test_external_malformed_message_is_dropped(self):
+        """Test: The bus logs and drops malformed external messages instead of raising."""
+        bus = A2ABus()
+        bus.subscribe(Topic.DELETE_ENTRY, lambda batch: None)
+        for data in (b'not json', b'[1,2]',
+                     b'["Dispatcher","not-a-time","DELETE_ENTRY","delete 1",{},"SUCCESS"]'):
+            self.assertFalse(bus.publish_external(data))
+        self.assertEqual(bus.pending(), 0)
+
+    def test_external_message_is_delivered(self):
+        """Test: Valid external messages reach subscribers as BusMessage objects."""
+        bus = A2ABus()
+        batches = []
+        bus.subscribe(Topic.DELETE_ENTRY, batches.append)
+        accepted = bus.publish_external(
+            b'["Dispatcher","2025-01-01T00:00:00","DELETE_ENTRY","delete 1",{"strategy_id":1},"SUCCESS"]'
+        )
+        bus.flush(Topic.DELETE_ENTRY)
+        self.assertTrue(accepted)
+        self.assertEqual(batches[0][0].payload, {"strategy_id": 1})
+
+if __name__ == '__main__':
+    unittest.main()
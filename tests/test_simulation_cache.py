@@ -0,0 +1,145 @@
+import importlib.util
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import create_autospec, patch
+from tools.simulation_tool import calculate_race_delta
+from tools.simulation_cache import SimulationCache, simulation_model_version
+
+class TestSimulationCache(unittest.TestCase):
+    """
+    Tests for the two-tier (LRU + SQLite) simulation memoization store.
+    """
+
+    def setUp(self):
+        fd, self.db_file = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.db_file)
+
+    def test_repeated_query_is_a_lookup(self):
+        """Test: The second identical call is served without re-simulating."""
+        func = create_autospec(calculate_race_delta, side_effect=calculate_race_delta)
+        with patch('tools.simulation_cache.simulation_model_version', return_value="v1"):
+            cache = SimulationCache(func, db_file=self.db_file)
+        first = cache(strategy_name="Undercut", pit_lap=20, tire_type="Medium")
+        second = cache(strategy_name="Undercut", pit_lap=20, tire_type="Medium")
+        cache.close()
+
+        self.assertEqual(first, second)
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_sqlite_tier_survives_new_session(self):
+        """Test: A new cache instance (new session) reads results from SQLite."""
+        with patch('tools.simulation_cache.simulation_model_version', return_value="v1"):
+            first_session = SimulationCache(calculate_race_delta, db_file=self.db_file)
+            first_session(strategy_name="Undercut", pit_lap=20, tire_type="Medium")
+            first_session.close()
+            func = create_autospec(calculate_race_delta, side_effect=AssertionError("should not simulate"))
+            cache = SimulationCache(func, db_file=self.db_file)
+        self.assertAlmostEqual(cache(strategy_name="Undercut", pit_lap=20, tire_type="Medium"), 3.40, places=2)
+        cache.close()
+
+    def test_model_version_change_invalidates_entries(self):
+        """Test: Entries from an older simulation-model version are purged."""
+        with patch('tools.simulation_cache.simulation_model_version', return_value="v1"):
+            first_session = SimulationCache(calculate_race_delta, db_file=self.db_file)
+            first_session(strategy_name="Undercut", pit_lap=20, tire_type="Medium")
+            first_session.close()
+        with patch('tools.simulation_cache.simulation_model_version', return_value="v2"):
+            cache = SimulationCache(calculate_race_delta, db_file=self.db_file)
+        cache.close()
+
+        conn = sqlite3.connect(self.db_file)
+        rows = conn.execute("SELECT COUNT(*) FROM simulation_cache").fetchone()[0]
+        conn.close()
+        self.assertEqual(rows, 0)
+
+    def test_lru_tier_is_bounded(self):
+        """Test: The in-memory tier evicts the least recently used entry."""
+        cache = SimulationCache(calculate_race_delta, db_file=self.db_file, maxsize=2)
+        cache(strategy_name="Check", pit_lap=10, tire_type="Hard")
+        cache(strategy_name="Check", pit_lap=11, tire_type="Hard")
+        cache(strategy_name="Check", pit_lap=10, tire_type="Hard")  # Lap 10 is now most recent
+        cache(strategy_name="Check", pit_lap=12, tire_type="Hard")  # Evicts lap 11, not lap 10
+
+        key = lambda lap: cache._make_key(cache._bind(
+            {"strategy_name": "Check", "pit_lap": lap, "tire_type": "Hard"}))[0]
+        self.assertEqual(list(cache._memory), [key(10), key(12)])
+        cache.close()
+
+    def test_integral_float_shares_key_with_int(self):
+        """Test: pit_lap=20.0 (as sent by the LLM) hits the entry written for pit_lap=20."""
+        cache = SimulationCache(calculate_race_delta, db_file=self.db_file)
+        cache(strategy_name="Undercut", pit_lap=20, tire_type="Medium")
+        result = cache(strategy_name="Undercut", pit_lap=20.0, tire_type="Medium")
+        cache.close()
+        self.assertAlmostEqual(result, 3.40, places=2)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_miss_passes_caller_arguments_through(self):
+        """Test: On a miss the simulation receives exactly what the caller sent."""
+        func = create_autospec(calculate_race_delta, side_effect=calculate_race_delta)
+        with patch('tools.simulation_cache.simulation_model_version', return_value="v1"):
+            cache = SimulationCache(func, db_file=self.db_file)
+        cache(strategy_name="Undercut", pit_lap=20.0, tire_type="Medium")
+        cache.close()
+        func.assert_called_once_with(strategy_name="Undercut", pit_lap=20.0, tire_type="Medium")
+
+    def test_fitted_params_change_model_version(self):
+        """Test: Refitting parameters yields a new simulation-model version."""
+        v1 = simulation_model_version(calculate_race_delta, {"tire_deg": 0.08})
+        v2 = simulation_model_version(calculate_race_delta, {"tire_deg": 0.09})
+        self.assertNotEqual(v1, v2)
+        self.assertEqual(v1, simulation_model_version(calculate_race_delta, {"tire_deg": 0.08}))
+
+    def test_source_change_changes_model_version(self):
+        """Test: Editing the simulation's source file yields a new simulation-model version."""
+        fd, path = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(fd, "w") as f:
+            f.write("def simulate(pit_lap):\n    return pit_lap / 50\n")
+        try:
+            spec = importlib.util.spec_from_file_location("temp_simulation", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            before = simulation_model_version(module.simulate)
+            with open(path, "w") as f:
+                f.write("def simulate(pit_lap):\n    return pit_lap / 40\n")
+            self.assertNotEqual(before, simulation_model_version(module.simulate))
+        finally:
+            os.remove(path)
+
+    def test_missing_argument_raises_type_error(self):
+        """Test: Invalid tool arguments still raise TypeError, as a direct call would."""
+        cache = SimulationCache(calculate_race_delta, db_file=self.db_file)
+        with self.assertRaises(TypeError):
+            cache(strategy_name="Undercut", pit_lap=20)
+        cache.close()
+
+    def test_writes_are_buffered_until_flush(self):
+        """Test: Misses are written to SQLite in one batch on flush()."""
+        cache = SimulationCache(calculate_race_delta, db_file=self.db_file)
+        for lap in range(15, 31):
+            cache(strategy_name="Check", pit_lap=lap, tire_type="Medium")
+
+        conn = sqlite3.connect(self.db_file)
+        count = lambda: conn.execute("SELECT COUNT(*) FROM simulation_cache").fetchone()[0]
+        self.assertEqual(count(), 0)
+        cache.flush()
+        self.assertEqual(count(), 16)
+        conn.close()
+        cache.close()
+
+    def test_sqlite_error_falls_back_to_simulation(self):
+        """Test: A SQLite failure (e.g. a locked database) does not lose the result."""
+        cache = SimulationCache(calculate_race_delta, db_file=self.db_file)
+        cache._conn.close()  # Every further SQLite call raises sqlite3.ProgrammingError
+        result = cache(strategy_name="Undercut", pit_lap=20, tire_type="Medium")
+        cache.flush()
+        self.assertAlmostEqual(result, 3.40, places=2)
+
+if __name__ == '__main__':
+    unittest.main()
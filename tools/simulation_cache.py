@@ -0,0 +1,188 @@
+# tools/simulation_cache.py
+
+import hashlib
+import inspect
+import json
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+
+from database import DATABASE_FILE
+
+# Use the same global logger instance configured in main.py
+logger = logging.getLogger('APW-STRATEGIST')
+
+
+def simulation_model_version(func: Callable, fitted_params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Fingerprints the simulation model: a hash of the source file that defines
+    `func` (its logic and any constants) plus any externally fitted parameters.
+    Editing tools/simulation_tool.py or refitting parameters yields a new version.
+    """
+    digest = hashlib.sha256()
+    with open(inspect.getsourcefile(func), "rb") as f:
+        digest.update(f.read())
+    digest.update(func.__qualname__.encode("utf-8"))
+    if fitted_params:
+        digest.update(json.dumps(fitted_params, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _normalize(value: Any) -> Any:
+    """Coerces integral floats to int (recursively) so 20 and 20.0 share a cache key."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+class SimulationCache:
+    """
+    Memoization store for simulation results.
+    An in-memory LRU tier sits in front of an indexed SQLite tier. Entries are
+    keyed on the full simulation inputs and the simulation-model version, so
+    results from an older model are never returned and are purged on startup.
+    New results are buffered and written to SQLite in one transaction on
+    flush() (or once write_batch_size rows are pending). If SQLite fails, the
+    cache logs a warning and keeps serving from memory or the raw simulation.
+    """
+
+    def __init__(self, func: Callable, db_file: str = DATABASE_FILE, maxsize: int = 1024,
+                 fitted_params: Optional[Dict[str, Any]] = None, write_batch_size: int = 256):
+        if maxsize < 1 or write_batch_size < 1:
+            raise ValueError("maxsize and write_batch_size must be at least 1.")
+        self.func = func
+        self.maxsize = maxsize
+        self.write_batch_size = write_batch_size
+        self.model_version = simulation_model_version(func, fitted_params)
+        self._signature = inspect.signature(func)
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._pending: Dict[str, Tuple] = {}
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            self._conn = sqlite3.connect(db_file)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS simulation_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model_name TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    inputs TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    timestamp TEXT NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_simulation_cache_model ON simulation_cache (model_name, model_version)"
+            )
+            # Automatic invalidation: drop results produced by any other model version
+            purged = self._conn.execute(
+                "DELETE FROM simulation_cache WHERE model_name = ? AND model_version != ?",
+                (self.func.__qualname__, self.model_version)
+            ).rowcount
+            self._conn.commit()
+            if purged:
+                logger.info(f"SIMULATION CACHE: Purged {purged} stale entries for {self.func.__qualname__}.")
+        except sqlite3.Error as e:
+            logger.warning(f"SIMULATION CACHE: SQLite tier unavailable, using memory only. Error: {e}")
+            self._conn = None
+
+    def _bind(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Binds kwargs to the simulation signature (raising TypeError like a direct call)."""
+        bound = self._signature.bind(**kwargs)
+        bound.apply_defaults()
+        arguments = {}
+        for name, value in bound.arguments.items():
+            kind = self._signature.parameters[name].kind
+            if kind is inspect.Parameter.VAR_POSITIONAL:
+                continue  # The cache is keyword-only, so *args is always empty
+            if kind is inspect.Parameter.VAR_KEYWORD:
+                arguments.update({k: _normalize(v) for k, v in value.items()})
+            else:
+                arguments[name] = _normalize(value)
+        return arguments
+
+    def _make_key(self, arguments: Dict[str, Any]) -> Tuple[str, str]:
+        inputs = json.dumps(arguments, sort_keys=True, separators=(',', ':'), default=str)
+        key = hashlib.sha256(f"{self.model_version}|{inputs}".encode("utf-8")).hexdigest()
+        return key, inputs
+
+    def _remember(self, key: str, result: Any):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _lookup_db(self, key: str) -> Optional[Tuple[Any]]:
+        """Returns (result,) from the SQLite tier, or None on a miss or SQLite error."""
+        pending = self._pending.get(key)
+        if pending is not None:
+            return (json.loads(pending[4]),)
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT result FROM simulation_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"SIMULATION CACHE: Lookup failed, simulating instead. Error: {e}")
+            return None
+        return None if row is None else (json.loads(row[0]),)
+
+    def __call__(self, **kwargs) -> Any:
+        """Returns the cached result for these inputs, simulating only on a miss."""
+        arguments = self._bind(kwargs)
+        key, inputs = self._make_key(arguments)
+
+        # Tier 1: in-memory LRU
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+
+        # Tier 2: SQLite (including rows not yet flushed)
+        found = self._lookup_db(key)
+        if found is not None:
+            self._remember(key, found[0])
+            self.hits += 1
+            return found[0]
+
+        # Miss: run the simulation with the caller's own arguments (errors propagate and are never cached)
+        self.misses += 1
+        result = self.func(**kwargs)
+        self._remember(key, result)
+        if self._conn is not None:
+            self._pending[key] = (key, self.func.__qualname__, self.model_version, inputs,
+                                  json.dumps(result), datetime.now().isoformat())
+            if len(self._pending) >= self.write_batch_size:
+                self.flush()
+        return result
+
+    def flush(self):
+        """Writes all buffered results to SQLite in a single transaction."""
+        if not self._pending or self._conn is None:
+            return
+        rows = list(self._pending.values())
+        self._pending.clear()
+        try:
+            self._conn.executemany("""
+                INSERT OR REPLACE INTO simulation_cache (cache_key, model_name, model_version, inputs, result, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"SIMULATION CACHE: Could not persist {len(rows)} results. Error: {e}")
+
+    def close(self):
+        """Flushes buffered results and closes the SQLite connection (safe to call twice)."""
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None